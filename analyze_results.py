@@ -1,53 +1,81 @@
 import json
 import os
 from glob import glob
-from collections import Counter
 import pandas as pd
 import matplotlib.pyplot as plt
 
+# pyarrow is optional. Without it, main.py writes a JSON file per frame instead of the
+# Parquet file, so we fall back to reading those.
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
 OUTPUT_DIR = "output"
-json_files = sorted(glob(os.path.join(OUTPUT_DIR, "*.json")))
+# The consolidated output written by main.py. It holds the detections of all frames in one file.
+FRAMES_PARQUET = os.path.join(OUTPUT_DIR, "frames.parquet")
+
+if pq is not None and os.path.exists(FRAMES_PARQUET):
+    # Read all detections with a single columnar read
+    df = pd.read_parquet(FRAMES_PARQUET, columns=["frame_id", "object_id", "class"])
+    # Frames without detections have no rows, so main.py stores the frame count in the metadata
+    metadata = pq.read_metadata(FRAMES_PARQUET).metadata or {}
+    n_frames = int(metadata.get(b"n_frames", df["frame_id"].nunique()))
+else:
+    # Fall back to the per-frame JSON files
+    json_files = sorted(glob(os.path.join(OUTPUT_DIR, "*.json")))
 
-if not json_files:
-    print(f"Warning: Could not find any JSON files to analyze in the '{OUTPUT_DIR}' directory.")
-    exit()
+    if not json_files:
+        print(f"Warning: Could not find any JSON files to analyze in the '{OUTPUT_DIR}' directory.")
+        exit()
 
-all_detections = []
-# Read all data from the JSON files
-for file_path in json_files:
-    with open(file_path, 'r', encoding='utf-8') as f:
-        try:
-            data = json.load(f)
-            all_detections.extend(data)
-        except json.JSONDecodeError:
-            print(f"WARNING: The file {file_path} is corrupted or empty. Skipping.")
+    all_detections = []
+    # Read all data from the JSON files
+    for file_path in json_files:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            try:
+                data = json.load(f)
+                all_detections.extend(data)
+            except json.JSONDecodeError:
+                print(f"WARNING: The file {file_path} is corrupted or empty. Skipping.")
+    df = pd.DataFrame(all_detections, columns=["object_id", "class"])
+    df["object_id"] = df["object_id"].fillna(-1)
+    n_frames = len(json_files)
 
-print(f"--- Analysis of {len(json_files)} frames completed ---")
+print(f"--- Analysis of {n_frames} frames completed ---")
 
 # (The analysis and print sections from the original code are here)
 
 # --- GENERATE PLOTS ---
 
-# 1. bar chart for unique object counts
-object_id_to_classes = {}
-for det in all_detections:
-    obj_id = det.get('object_id', -1)
-    if obj_id != -1:
-        if obj_id not in object_id_to_classes:
-            object_id_to_classes[obj_id] = []
-        object_id_to_classes[obj_id].append(det['class'])
+# Only detections that were assigned a tracking ID belong to a unique object.
+# Their position keeps the order in which they were detected.
+tracked = df[df["object_id"] != -1].reset_index(drop=True)
+tracked["position"] = tracked.index
 
-unique_objects_final_class = {}
-for obj_id, class_list in object_id_to_classes.items():
-    most_common_class = Counter(class_list).most_common(1)[0][0]
-    unique_objects_final_class[obj_id] = most_common_class
+# 1. bar chart for unique object counts
+# Each unique object gets the class it was most often detected as. On a tie, the class
+# that was detected first wins. Count every (object, class) pair and note where it first
+# appeared, then keep the best class of each object.
+pair_counts = (
+    tracked.groupby(["object_id", "class"])["position"]
+    .agg(count="size", first_position="min")
+    .reset_index()
+)
+unique_objects_final_class = (
+    pair_counts.sort_values(["count", "first_position"], ascending=[False, True])
+    .drop_duplicates("object_id")
+    .set_index("object_id")["class"]
+    # List the objects in the order they first appeared
+    .reindex(tracked["object_id"].unique())
+)
 
-if unique_objects_final_class:
-    final_unique_counts = Counter(unique_objects_final_class.values())
+if not unique_objects_final_class.empty:
+    final_unique_counts = unique_objects_final_class.value_counts(sort=False)
     
     # Prepare data for the plot
-    labels = list(final_unique_counts.keys())
-    counts = list(final_unique_counts.values())
+    labels = final_unique_counts.index.tolist()
+    counts = final_unique_counts.values
     
     plt.figure(figsize=(10, 6))
     bars = plt.bar(labels, counts, color=['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728'])
@@ -63,10 +91,9 @@ if unique_objects_final_class:
     print("\nGenerated plot: 'unique_object_counts.png'")
 
 # 2. Histogram of tracking durations
-valid_ids = [det.get('object_id', -1) for det in all_detections if det.get('object_id', -1) != -1]
-if valid_ids:
-    id_counts = Counter(valid_ids)
-    durations = list(id_counts.values())
+if not tracked.empty:
+    # The number of frames each object appears in
+    durations = tracked["object_id"].value_counts().values
     
     plt.figure(figsize=(10, 6))
     plt.hist(durations, bins=30, color='skyblue', edgecolor='black')
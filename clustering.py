@@ -1,8 +1,9 @@
 import numpy as np
 from sklearn.cluster import DBSCAN
+from sklearn.neighbors import NearestNeighbors
 
 
-def cluster_objects(points, eps=0.5, min_samples=10):
+def cluster_objects(points, eps=0.5, min_samples=10, sample_weight=None, n_jobs=-1):
     """
     Clusters the non-ground points using the DBSCAN algorithm.
 
@@ -12,6 +13,10 @@ def cluster_objects(points, eps=0.5, min_samples=10):
                      as in the neighborhood of the other.
         min_samples (int): The number of samples in a neighborhood for a point to be
                            considered as a core point.
+        sample_weight (np.ndarray, optional): How many original points each point represents,
+                                              e.g. after voxel downsampling. DBSCAN counts them
+                                              towards min_samples. Defaults to 1 per point.
+        n_jobs (int): The number of threads used for the neighbor search. -1 uses all cores.
 
     Returns:
         Tuple[np.ndarray, int]: A tuple containing:
@@ -23,10 +28,16 @@ def cluster_objects(points, eps=0.5, min_samples=10):
 
     # Apply DBSCAN only on the XYZ coordinates (the first 3 columns).
     # This prevents the intensity value from affecting the clustering process.
-    clustering = DBSCAN(eps=eps, min_samples=min_samples).fit(points[:, :3])
+    # Build the sparse radius-neighbors graph with a KD-tree search and hand it to DBSCAN
+    # as a precomputed metric, so DBSCAN doesn't have to build its own neighbor structure.
+    neighbors = NearestNeighbors(radius=eps, algorithm='kd_tree', leaf_size=40, n_jobs=n_jobs).fit(points[:, :3])
+    graph = neighbors.radius_neighbors_graph(mode='distance')
+
+    clustering = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit(graph, sample_weight=sample_weight)
     labels = clustering.labels_
 
     # Calculate the number of clusters, excluding any noise points.
-    n_clusters = len(set(labels)) - (1 if -1 in labels else 0)
+    # DBSCAN labels clusters 0..K-1, so the largest label gives the count directly.
+    n_clusters = int(labels.max()) + 1
 
-    return labels, n_clusters
\ No newline at end of file
+    return labels, n_clusters
@@ -1,5 +1,16 @@
 import numpy as np
-import open3d as o3d
+
+# Open3D is optional here. It is only needed for the "open3d" RANSAC backend.
+try:
+    import open3d as o3d
+except ImportError:
+    o3d = None
+
+# CuPy is optional. It is only needed for the GPU ("cupy") RANSAC backend.
+try:
+    import cupy as cp
+except ImportError:
+    cp = None
 
 """
 ground_filter.py
@@ -7,7 +18,60 @@ ground_filter.py
 This file contains the function used to filter out ground points from the point cloud.
 """
 
-def filter_ground_ransac(points, distance_threshold=0.2, ransac_n=3, num_iterations=1000):
+RANSAC_BACKENDS = ("numpy", "open3d", "cupy")
+
+def _segment_plane_vectorized(xyz, distance_threshold, num_iterations, xp=np, batch_size=64):
+    """
+    Finds the largest plane with RANSAC, evaluating all iterations as batched array operations.
+    Because RANSAC iterations are independent, every candidate plane is sampled and scored at once
+    instead of one after the other. The same code runs on the CPU (NumPy) or the GPU (CuPy).
+
+    Args:
+        xyz (array): The XYZ coordinates of the point cloud (N x 3), as a NumPy or CuPy array.
+        distance_threshold (float): The maximum distance a point can be from the plane to be
+                                    considered part of it.
+        num_iterations (int): The number of candidate planes to evaluate.
+        xp (module): The array module to use, either numpy or cupy.
+        batch_size (int): How many candidate planes are scored against the full cloud at once.
+                          This bounds the memory used by the (N x batch_size) distance matrix.
+
+    Returns:
+        array: A boolean mask of length N that is True for the points on the best plane.
+    """
+    n_points = xyz.shape[0]
+
+    # Sample 3 points for every iteration and build each candidate plane from them.
+    samples = xyz[xp.random.randint(0, n_points, size=(num_iterations, 3))]
+    p1 = samples[:, 0]
+    edge1 = samples[:, 1] - p1
+    edge2 = samples[:, 2] - p1
+    normals = xp.cross(edge1, edge2)
+    norms = xp.linalg.norm(normals, axis=1)
+    # Collinear or repeated samples don't define a plane, so we ignore them.
+    # The cross product's norm is |edge1| * |edge2| * sin(angle), so we compare against the edge
+    # lengths. An absolute threshold would accept nearly collinear samples due to rounding errors.
+    valid = norms > 1e-3 * xp.linalg.norm(edge1, axis=1) * xp.linalg.norm(edge2, axis=1)
+    normals = normals / xp.where(valid, norms, 1.0)[:, None]
+    offsets = -xp.sum(normals * p1, axis=1)
+
+    # If no sample defined a plane (e.g., the cloud is collinear), there is no ground to report.
+    if not bool(valid.any()):
+        return xp.zeros(n_points, dtype=bool)
+
+    # Count the inliers of every candidate plane.
+    inlier_counts = xp.zeros(num_iterations, dtype=xp.int64)
+    for start in range(0, num_iterations, batch_size):
+        stop = min(start + batch_size, num_iterations)
+        distances = xp.abs(xyz @ normals[start:stop].T + offsets[start:stop])
+        inlier_counts[start:stop] = xp.count_nonzero(distances <= distance_threshold, axis=0)
+    inlier_counts[~valid] = -1
+
+    # Keep the plane with the most inliers.
+    best = int(inlier_counts.argmax())
+    return xp.abs(xyz @ normals[best] + offsets[best]) <= distance_threshold
+
+
+def filter_ground_ransac(points, distance_threshold=0.2, ransac_n=3, num_iterations=1000, backend="numpy"):
     """
     Finds the ground plane using the RANSAC algorithm and returns the non-ground points.
     This method works well even on sloped surfaces and preserves all feature columns (e.g., intensity).
@@ -17,30 +81,60 @@ def filter_ground_ransac(points, distance_threshold=0.2, ransac_n=3, num_iterati
         distance_threshold (float): The maximum distance a point can be from the plane to be
                                     considered part of the ground.
         ransac_n (int): The number of points used to estimate the plane model.
+                        The "numpy" and "cupy" backends always use 3 points.
         num_iterations (int): The number of iterations the RANSAC algorithm runs.
+        backend (str): Which RANSAC implementation to use:
+                       - "numpy": A vectorized NumPy version that evaluates all iterations at once.
+                         This is the default, as it avoids copying the points into Open3D.
+                       - "open3d": Open3D's segment_plane (single-threaded). Falls back to "numpy"
+                         if Open3D is not installed.
+                       - "cupy": The same vectorized version on a CUDA GPU. Falls back to "numpy"
+                         if CuPy is not installed.
 
     Returns:
-        np.ndarray: An array containing only the non-ground points.
+        Tuple[np.ndarray, np.ndarray]: A tuple containing:
+            - non_ground_points (np.ndarray): An array containing only the non-ground points.
+            - ground_mask (np.ndarray): A boolean mask over the input array that is True for the ground points.
     """
+    if backend not in RANSAC_BACKENDS:
+        raise ValueError(f"Unknown RANSAC backend '{backend}'. Expected one of {RANSAC_BACKENDS}.")
+
     if points is None or points.shape[0] < ransac_n:
         print("[filter_ground_ransac] Invalid or insufficient number of points.")
-        return np.empty((0, points.shape[1]))
-
-    # Create an Open3D PointCloud object, using only the XYZ coordinates for plane fitting.
-    pcd = o3d.geometry.PointCloud()
-    pcd.points = o3d.utility.Vector3dVector(points[:, :3])
-
-    # Segment the largest plane, which we assume is the ground.
-    _, inliers = pcd.segment_plane(
-        distance_threshold=distance_threshold,
-        ransac_n=ransac_n,
-        num_iterations=num_iterations
-    )
-    
-    # The 'inliers' are the indices of the ground points. We want everything else.
-    # Let's remove the ground points from the original array to get the non-ground points.
-    non_ground_points = np.delete(points, inliers, axis=0)
+        # Every point is dropped, so the mask marks all of them, keeping points[~ground_mask] consistent.
+        return np.empty((0, points.shape[1]), dtype=points.dtype), np.ones(points.shape[0], dtype=bool)
+
+    if backend == "cupy" and cp is None:
+        print("[filter_ground_ransac] CuPy is not installed. Falling back to the 'numpy' backend.")
+        backend = "numpy"
+    if backend == "open3d" and o3d is None:
+        print("[filter_ground_ransac] Open3D is not installed. Falling back to the 'numpy' backend.")
+        backend = "numpy"
+
+    if backend == "numpy":
+        ground_mask = _segment_plane_vectorized(points[:, :3], distance_threshold, num_iterations)
+    elif backend == "cupy":
+        xyz = cp.asarray(points[:, :3])
+        ground_mask = cp.asnumpy(_segment_plane_vectorized(xyz, distance_threshold, num_iterations, xp=cp))
+    else:
+        # Create an Open3D PointCloud object, using only the XYZ coordinates for plane fitting.
+        # Open3D requires float64, so only this 3-column copy is converted.
+        pcd = o3d.geometry.PointCloud()
+        pcd.points = o3d.utility.Vector3dVector(points[:, :3].astype(np.float64))
+
+        # Segment the largest plane, which we assume is the ground.
+        _, plane_inliers = pcd.segment_plane(
+            distance_threshold=distance_threshold,
+            ransac_n=ransac_n,
+            num_iterations=num_iterations
+        )
+        ground_mask = np.zeros(points.shape[0], dtype=bool)
+        ground_mask[plane_inliers] = True
+
+    # The mask marks the ground points. We want everything else.
+    # Selecting with the inverted mask avoids the extra reallocation of np.delete.
+    non_ground_points = points[~ground_mask]
     
     print(f"Number of non-ground points after RANSAC: {non_ground_points.shape[0]}")
     
-    return non_ground_points
\ No newline at end of file
+    return non_ground_points, ground_mask
@@ -1,23 +1,200 @@
 import os
+import csv
+import json
+from functools import lru_cache
+import numpy as np
 import pandas as pd
-from glob import glob
 
-def get_all_csv_files(data_root):
+# pyarrow's multithreaded CSV reader is much faster than pandas for large frames.
+# It is optional: if it is not installed we fall back to pandas.
+# It is also used to write the consolidated Parquet output of all frames.
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pacsv = None
+    pq = None
+
+# orjson serializes JSON in C and is much faster than the standard json module.
+# It is optional: if it is not installed we fall back to json.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# We expect these specific columns to be in every LiDAR file.
+EXPECTED_COLS = ['X', 'Y', 'Z', 'INTENSITY']
+
+# The columns of the consolidated Parquet output. Each row is one detected object in one frame.
+DETECTION_SCHEMA = pa.schema([
+    ("frame_id", pa.int32()),
+    ("object_id", pa.int64()),
+    ("cluster_id", pa.int32()),
+    ("class", pa.string()),
+    ("num_points", pa.int32()),
+    ("width", pa.float64()),
+    ("length", pa.float64()),
+    ("height", pa.float64()),
+    ("avg_intensity", pa.int32()),
+]) if pa is not None else None
+
+def _scan_csv_files(data_root):
+    """
+    Recursively finds all CSV files under a root directory with os.scandir,
+    and records the modification time of every directory it visits.
+    Like glob, hidden files and folders (starting with '.') are skipped.
+    Args:
+        data_root (str): The main data folder.
+
+    Returns:
+        Tuple[List[str], dict]: The sorted CSV paths, and a {directory: mtime} mapping.
+    """
+    csv_files = []
+    dir_mtimes = {}
+    pending_dirs = [data_root]
+    while pending_dirs:
+        directory = pending_dirs.pop()
+        dir_mtimes[directory] = os.stat(directory).st_mtime
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir():
+                    pending_dirs.append(entry.path)
+                elif entry.is_file() and entry.name.endswith('.csv'):
+                    csv_files.append(entry.path)
+    return sorted(csv_files), dir_mtimes
+
+
+def get_all_csv_files(data_root, cache_path=".csv_file_cache.json"):
     """
     Finds the paths of all CSV files within a given root directory.
+    The result is cached on disk together with the modification time of every folder.
+    Adding or removing a file changes its folder's mtime, so as long as none of them
+    changed, the cached list is returned without walking the whole tree again.
     Args:
         data_root (str): The main data folder.
+        cache_path (str): The file used to cache the result. Set to None to disable caching.
 
     Returns:
         List[str]: A sorted list of full paths to the CSV files.
     """
-    pattern = os.path.join(data_root, "**", "*.csv")
-    return sorted(glob(pattern, recursive=True))
+    if not os.path.isdir(data_root):
+        return []
+
+    root_key = os.path.abspath(data_root)
+    if cache_path is not None:
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache["data_root"] == root_key and all(
+                    os.stat(directory).st_mtime == mtime for directory, mtime in cache["dir_mtimes"].items()):
+                return cache["files"]
+        except (OSError, ValueError, KeyError):
+            # No cache yet, it is unreadable, or a folder was removed. Scan again.
+            pass
+
+    csv_files, dir_mtimes = _scan_csv_files(data_root)
+
+    if cache_path is not None:
+        try:
+            with open(cache_path, 'w', encoding='utf-8') as f:
+                json.dump({"data_root": root_key, "dir_mtimes": dir_mtimes, "files": csv_files}, f)
+        except OSError as e:
+            print(f"WARNING: Could not write the file list cache ({cache_path}): {e}")
+
+    return csv_files
+
+
+@lru_cache(maxsize=None)
+def _map_columns(header_line):
+    """
+    Matches the expected column names against a raw CSV header line.
+    All frames of a recording share the same header, so the result is cached.
+    Args:
+        header_line (str): The first line of the CSV file.
+
+    Returns:
+        Tuple[str]: The actual column names in the file, in the order of EXPECTED_COLS.
+    """
+    # Parse the header like the CSV readers do, so quoted column names are handled too.
+    names = next(csv.reader([header_line], delimiter=';'))
+    # Clean up column names to be consistent (e.g., remove whitespace, make uppercase)
+    header = {name.strip().upper(): name for name in names}
+    if not all(col in header for col in EXPECTED_COLS):
+        raise ValueError(f"ERROR: Missing required columns. Expected {EXPECTED_COLS}, but found: {list(header)}")
+    return tuple(header[col] for col in EXPECTED_COLS)
+
+
+def _read_source_columns(path):
+    """
+    Peeks at the header line only and returns the actual names of the expected columns.
+    Args:
+        path (str): The path to the CSV file.
+
+    Returns:
+        Tuple[str]: The actual column names in the file, in the order of EXPECTED_COLS.
+    """
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        header_line = f.readline().rstrip('\r\n')
+    return _map_columns(header_line)
+
+
+def _read_with_pyarrow(path, source_cols):
+    """
+    Reads the X, Y, Z, and INTENSITY columns of a LiDAR CSV file using pyarrow.
+    Args:
+        path (str): The path to the CSV file.
+        source_cols (List[str]): The actual names of the expected columns in the file.
+
+    Returns:
+        np.ndarray: A float32 array of shape (N, 4).
+    """
+    convert_options = pacsv.ConvertOptions(
+        column_types={col: pa.float32() for col in source_cols},
+        include_columns=source_cols
+    )
+    table = pacsv.read_csv(
+        path,
+        read_options=pacsv.ReadOptions(use_threads=True),
+        parse_options=pacsv.ParseOptions(delimiter=';'),
+        convert_options=convert_options
+    )
+
+    # Stack the columns directly, which skips the extra .astype(float) copy.
+    return np.column_stack([table.column(col).to_numpy() for col in source_cols])
+
+
+def _read_with_pandas(path, source_cols):
+    """
+    Reads the X, Y, Z, and INTENSITY columns of a LiDAR CSV file using pandas.
+    Args:
+        path (str): The path to the CSV file.
+        source_cols (List[str]): The actual names of the expected columns in the file.
+
+    Returns:
+        np.ndarray: A float32 array of shape (N, 4).
+    """
+    # Only parse the columns we need, directly as float32, so no cast is needed afterwards.
+    df = pd.read_csv(
+        path,
+        sep=';',
+        encoding='utf-8',
+        usecols=source_cols,
+        dtype={col: np.float32 for col in source_cols},
+        engine='c'
+    )
+    return df[source_cols].to_numpy(copy=False)
 
 
 def read_lidar_csv(path):
     """
     Reads a LiDAR frame from a CSV file and returns the X, Y, Z, and INTENSITY data.
+    Uses pyarrow when it is available and falls back to pandas otherwise.
+    The values are stored as float32, which is precise enough for LiDAR coordinates and
+    halves the memory traffic of every later processing step.
     Args:
         path (str): The path to the CSV file.
 
@@ -26,17 +203,11 @@ def read_lidar_csv(path):
                     Returns None if the file cannot be read.
     """
     try:
-        df = pd.read_csv(path, sep=';', encoding='utf-8')
-        # Clean up column names to be consistent (e.g., remove whitespace, make uppercase)
-        df.columns = df.columns.str.strip().str.upper()
-
-        # We expect these specific columns to be in the file.
-        expected_cols = ['X', 'Y', 'Z', 'INTENSITY']
-        if not all(col in df.columns for col in expected_cols):
-            raise ValueError(f"ERROR: Missing required columns. Expected {expected_cols}, but found: {df.columns.tolist()}")
-
-        # Extract the required columns and convert them to a NumPy array.
-        points_with_intensity = df[expected_cols].values.astype(float)
+        source_cols = list(_read_source_columns(path))
+        if pacsv is not None:
+            points_with_intensity = _read_with_pyarrow(path, source_cols)
+        else:
+            points_with_intensity = _read_with_pandas(path, source_cols)
 
         if points_with_intensity.shape[0] == 0:
             raise ValueError("The CSV file contains no data points.")
@@ -45,4 +216,60 @@ def read_lidar_csv(path):
     
     except Exception as e:
         print(f"ERROR reading file ({path}): {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def write_json(path, data):
+    """
+    Writes data to a JSON file, using orjson when it is available.
+    Args:
+        path (str): The path of the output JSON file.
+        data: The JSON-serializable data to write.
+    """
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def open_detection_writer(path):
+    """
+    Opens a Parquet file that the detections of every frame are streamed into.
+    The file stays open for the whole run, so each frame is appended without
+    creating and closing a new file. Close the writer after the last frame.
+    Args:
+        path (str): The path of the output Parquet file.
+
+    Returns:
+        pyarrow.parquet.ParquetWriter: The open writer, or None if pyarrow is not installed.
+    """
+    if pq is None:
+        print(f"WARNING: pyarrow is not installed, so {path} will not be written.")
+        return None
+    return pq.ParquetWriter(path, DETECTION_SCHEMA)
+
+
+def write_detections(writer, rows):
+    """
+    Appends the detections of one frame to an open Parquet writer.
+    Args:
+        writer (pyarrow.parquet.ParquetWriter): The writer returned by open_detection_writer.
+        rows (List[dict]): One dictionary per detection, with the columns of DETECTION_SCHEMA.
+    """
+    if rows:
+        writer.write_table(pa.Table.from_pylist(rows, schema=DETECTION_SCHEMA))
+
+
+def close_detection_writer(writer, n_frames):
+    """
+    Records how many frames were processed and closes the Parquet file.
+    Frames without detections have no rows, so the count is stored in the
+    file's key-value metadata under "n_frames" instead.
+    Args:
+        writer (pyarrow.parquet.ParquetWriter): The writer returned by open_detection_writer.
+        n_frames (int): The number of frames that were processed.
+    """
+    writer.add_key_value_metadata({"n_frames": str(n_frames)})
+    writer.close()
@@ -1,13 +1,16 @@
 import os
-import json
+import multiprocessing
+import numpy as np
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 import open3d as o3d
 
 # Import custom modules
-from io_utils import get_all_csv_files, read_lidar_csv
+from io_utils import get_all_csv_files, read_lidar_csv, write_json, open_detection_writer, write_detections, close_detection_writer
+from voxel_filter import voxel_downsample
 from ground_filter import filter_ground_ransac
 from clustering import cluster_objects
-from object_features import extract_features, classify_object_advanced
+from object_features import extract_features, classify_objects_advanced
 from tracker import EuclideanDistTracker
 from visualization import visualize_points, visualize_clusters, visualize_tracked_objects
 
@@ -16,6 +19,10 @@ main.py
 
 This is the main script that runs the entire LiDAR processing pipeline.
 It calls functions from other modules to perform each step in sequence.
+
+Reading, ground filtering, clustering, and feature extraction don't depend on other
+frames, so they run in parallel worker processes. Only the tracker carries state
+across frames, so it runs in the main process, which consumes the frames in order.
 """
 
 # --- SETUP ---
@@ -28,10 +35,24 @@ os.makedirs("output", exist_ok=True)
 # The root folder where the LiDAR data is stored
 DATA_ROOT = "data"
 
+# A single Parquet file with the detections of all frames, used by analyze_results.py
+FRAMES_PARQUET = "output/frames.parquet"
+# Whether to also save a separate JSON file for every frame. This is always done if
+# pyarrow is not installed, since the Parquet file can't be written then.
+SAVE_FRAME_JSON = False
+
+# Voxel grid size (in meters) used to downsample each frame before ground filtering.
+# 5cm keeps the shape of the ground and of objects while removing most redundant points.
+# Set to None to process every point.
+VOXEL_SIZE = 0.05
+
 # RANSAC parameters for ground filtering
 # The max distance (in meters) a point can be from the plane to be considered ground.
 # 0.2 meters (20cm) is usually a good starting point.
 RANSAC_DISTANCE_THRESHOLD = 0.2
+# Which RANSAC implementation to use: "open3d", "numpy" (vectorized, all iterations at once),
+# or "cupy" (the vectorized version on a CUDA GPU).
+RANSAC_BACKEND = "numpy"
 
 # DBSCAN parameters for object clustering
 # These values can be tuned to get the best results.
@@ -40,131 +61,239 @@ RANSAC_DISTANCE_THRESHOLD = 0.2
 DBSCAN_EPS = 1.0
 DBSCAN_MIN_SAMPLES = 20
 
-# --- INITIALIZATION ---
-
-# Get the paths of all CSV files to be processed
-all_paths = get_all_csv_files(DATA_ROOT)
-if not all_paths:
-    print(f"Warning: No CSV files found in the '{DATA_ROOT}' directory.")
-    exit()
-print(f"Found {len(all_paths)} frames to process.")
+# The number of threads each worker may use for its own parallel steps (the neighbor search,
+# the CSV reader, and the NumPy/BLAS math). The frames themselves already run in parallel,
+# so more threads per worker would only compete for the same cores.
+WORKER_THREADS = 1
+# The number of worker processes used to process frames in parallel.
+# Together with WORKER_THREADS, this keeps the total number of threads at about one per core.
+MAX_WORKERS = max(1, (os.cpu_count() or 1) // WORKER_THREADS)
+# How many frames are sent to a worker at a time. Larger chunks reduce inter-process overhead.
+WORKER_CHUNKSIZE = 4
 
-# Set the number of frames to process (use len(all_paths) for the full dataset)
-MAX_FRAMES = len(all_paths)
+# --- PER-FRAME PROCESSING ---
 
-# Initialize the object tracker outside the loop
-# This allows the tracker to maintain its memory across all frames.
-tracker = EuclideanDistTracker()
+def process_frame(path):
+    """
+    Runs the per-frame part of the pipeline: reading, ground filtering, clustering,
+    feature extraction, and classification. This step has no cross-frame state,
+    so it can run in a worker process.
 
-# --- PROCESSING LOOP ---
-
-# Process each frame one by one
-for i, path in enumerate(all_paths[:MAX_FRAMES]):
-    print(f"\n[{i+1}/{MAX_FRAMES}] Processing frame: {os.path.basename(path)}")
+    Args:
+        path (str): The path to the frame's CSV file.
 
+    Returns:
+        Tuple[np.ndarray, np.ndarray] or None: A tuple containing:
+            - features (np.ndarray): The structured feature array of every cluster in the frame.
+            - classes (np.ndarray): The class label of every cluster, in the same order.
+        Returns None if the frame should be skipped.
+    """
     # Step 1: Read the LiDAR data (X, Y, Z, Intensity)
     points_with_intensity = read_lidar_csv(path)
     if points_with_intensity is None:
-        print("Skipped: Could not read the file.")
-        continue
-    print(f"Total points in frame: {points_with_intensity.shape[0]}")
+        print(f"Skipped {os.path.basename(path)}: Could not read the file.")
+        return None
+    print(f"Total points in frame {os.path.basename(path)}: {points_with_intensity.shape[0]}")
+
+    # Step 2: Downsample the frame on a voxel grid, keeping track of how many
+    # original points each remaining point stands for
+    if VOXEL_SIZE:
+        points_with_intensity, point_counts = voxel_downsample(points_with_intensity, voxel_size=VOXEL_SIZE)
+    else:
+        point_counts = np.ones(points_with_intensity.shape[0], dtype=np.int64)
 
-    # Step 2: Filter out the ground using RANSAC
-    non_ground_points = filter_ground_ransac(
+    # Step 3: Filter out the ground using RANSAC
+    non_ground_points, ground_mask = filter_ground_ransac(
         points_with_intensity, 
-        distance_threshold=RANSAC_DISTANCE_THRESHOLD
+        distance_threshold=RANSAC_DISTANCE_THRESHOLD,
+        backend=RANSAC_BACKEND
     )
     
     if non_ground_points.shape[0] == 0:
-        print("Warning: No points left after ground filtering. Skipping frame.")
-        continue
+        print(f"Warning: No points left after ground filtering in {os.path.basename(path)}. Skipping frame.")
+        return None
+    non_ground_counts = point_counts[~ground_mask]
 
-    # Step 3: Cluster the remaining points into objects using DBSCAN
+    # Step 4: Cluster the remaining points into objects using DBSCAN
     labels, n_clusters = cluster_objects(
         non_ground_points, 
         eps=DBSCAN_EPS, 
-        min_samples=DBSCAN_MIN_SAMPLES
+        min_samples=DBSCAN_MIN_SAMPLES,
+        sample_weight=non_ground_counts,
+        n_jobs=WORKER_THREADS
     )
-    print(f"Found {n_clusters} potential object clusters.")
-
-    # Step 4: Extract features, classify, and track the objects
-    if n_clusters > 0:
-        features = extract_features(non_ground_points, labels)
-
-        # Prepare a list of detections for the tracker
-        detections_for_tracker = []
-        for feat in features:
-            # Temporarily classify objects to filter out noise before tracking
-            feat["class"] = classify_object_advanced(feat)
-            if feat["class"] != 'noise':
-                # The tracker uses a 2D bounding box (top-down view)
-                min_x, min_y, _ = feat["bbox_min"]
-                w = feat["width"]
-                h = feat["length"]
-                detections_for_tracker.append([min_x, min_y, w, h])
-
-        # Update the tracker with the new detections
-        tracked_objects = tracker.update(detections_for_tracker)
-        
-        # Match the tracker IDs back to our feature list
-        for feat in features:
-            feat['object_id'] = -1  # Default to no ID
-            if feat["class"] != 'noise':
-                min_x, min_y, _ = feat["bbox_min"]
-                # Find the closest tracked object for each feature
-                for tobj in tracked_objects:
-                    tx, ty, _, _, obj_id = tobj
-                    # If the starting points of the bounding boxes are very close, they match.
-                    if abs(min_x - tx) < 0.1 and abs(min_y - ty) < 0.1:
-                        feat['object_id'] = obj_id
-                        break
-        
-        # Print a summary of the classes and tracked objects for this frame
-        class_counts = Counter([f["class"] for f in features])
-        print("▶ Class distribution:")
-        for cls, count in sorted(class_counts.items()):
-            print(f"  - {cls.capitalize()}: {count} clusters")
-        print(f"▶ Number of tracked objects: {len(tracked_objects)}")
 
-    else:
-        features = []
-        # If no objects are detected, update the tracker with an empty list to clear its memory
-        tracker.update([])
-        print("▶ Class distribution: No clusters found.")
-
-    # Step 5: Visualization (optional, for debugging the first frame)
-    # To use this, uncomment the block below and set MAX_FRAMES to a small number.
-    # if i == 0:
-    #     print("\nOpening visualization windows for the first frame...")
-    #     # 1. Show ground vs. non-ground points
-    #     visualize_points(points_with_intensity, non_ground_points)
-    #     # 2. Show colored clusters
-    #     if n_clusters > 0:
-    #         visualize_clusters(non_ground_points, labels)
-    #         # 3. Show tracked objects with bounding boxes
-    #         visualize_tracked_objects(non_ground_points, features)
-
-    # Step 6: Save the results to a JSON file
-    # We save the results for every frame for later analysis.
-    output_data = [
-        {
-            "object_id": feat.get("object_id", -1),
-            "cluster_id": feat["label"],
-            "class": feat["class"],
-            "num_points": feat["num_points"],
-            "dimensions_m": {
-                "width": feat["width"],
-                "length": feat["length"],
-                "height": feat["height"]
-            },
-            "avg_intensity": feat.get("avg_intensity", 0)
-        }
-        for feat in features if feat["class"] != "noise"  # Don't save noise clusters
-    ]
-
-    output_filename = f"output/frame_{i+1:03d}_analysis.json"
-    with open(output_filename, "w", encoding="utf-8") as f:
-        json.dump(output_data, f, indent=4, ensure_ascii=False)
-    print(f"Analysis results saved to: {output_filename}")
-
-print("\nProcessing complete.")
\ No newline at end of file
+    # Step 5: Extract features and classify the objects
+    features = extract_features(non_ground_points, labels, point_counts=non_ground_counts)
+    # Temporarily classify objects to filter out noise before tracking
+    classes = classify_objects_advanced(features)
+    return features, classes
+
+
+if __name__ == "__main__":
+
+    # --- INITIALIZATION ---
+
+    # Get the paths of all CSV files to be processed
+    all_paths = get_all_csv_files(DATA_ROOT)
+    if not all_paths:
+        print(f"Warning: No CSV files found in the '{DATA_ROOT}' directory.")
+        exit()
+    print(f"Found {len(all_paths)} frames to process.")
+
+    # Set the number of frames to process (use len(all_paths) for the full dataset)
+    MAX_FRAMES = len(all_paths)
+
+    # Initialize the object tracker outside the loop
+    # This allows the tracker to maintain its memory across all frames.
+    tracker = EuclideanDistTracker()
+
+    # The detections of all frames are streamed into one Parquet file that stays open during the run
+    detection_writer = open_detection_writer(FRAMES_PARQUET)
+    save_frame_json = SAVE_FRAME_JSON or detection_writer is None
+    # The number of frames whose results were saved, including frames without any objects
+    n_saved_frames = 0
+
+    # --- PROCESSING LOOP ---
+
+    # Limit the thread pools of BLAS, OpenMP, and pyarrow in the workers. These variables are
+    # read when the libraries are loaded, so they must be set before the workers start.
+    # A limit the user already exported is kept.
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, str(WORKER_THREADS))
+
+    try:
+        # The workers process frames concurrently, but executor.map yields their results in order.
+        # We use 'spawn' so each worker starts from a fresh interpreter. Forking a process whose
+        # libraries may already be running threads can deadlock.
+        with ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn")) as executor:
+            frame_paths = all_paths[:MAX_FRAMES]
+            results = executor.map(process_frame, frame_paths, chunksize=WORKER_CHUNKSIZE)
+
+            for i, (path, result) in enumerate(zip(frame_paths, results)):
+                print(f"\n[{i+1}/{MAX_FRAMES}] Processed frame: {os.path.basename(path)}")
+
+                if result is None:
+                    print("Skipped: The frame could not be processed.")
+                    continue
+                features, classes = result
+                print(f"Found {len(features)} potential object clusters.")
+
+                # Step 6: Track the objects
+                # Every cluster starts without a tracking ID. Noise clusters are never tracked.
+                object_ids = np.full(len(features), -1, dtype=np.int64)
+                is_object = classes != 'noise'
+                if len(features) > 0:
+                    # The tracker uses a 2D bounding box (top-down view): [min_x, min_y, width, length]
+                    objects = features[is_object]
+                    detections_for_tracker = np.column_stack([
+                        objects["bbox_min"][:, 0],
+                        objects["bbox_min"][:, 1],
+                        objects["width"],
+                        objects["length"]
+                    ]).tolist()
+
+                    # Update the tracker with the new detections
+                    tracked_objects = tracker.update(detections_for_tracker)
+                
+                    # The tracker returns its objects in the same order as the detections,
+                    # so each tracker ID belongs to the cluster at the same position.
+                    object_ids[is_object] = [tobj[4] for tobj in tracked_objects]
+                
+                    # Print a summary of the classes and tracked objects for this frame
+                    class_counts = Counter(classes.tolist())
+                    print("▶ Class distribution:")
+                    for cls, count in sorted(class_counts.items()):
+                        print(f"  - {cls.capitalize()}: {count} clusters")
+                    print(f"▶ Number of tracked objects: {len(tracked_objects)}")
+
+                else:
+                    # If no objects are detected, update the tracker with an empty list to clear its memory
+                    tracker.update([])
+                    print("▶ Class distribution: No clusters found.")
+
+                # Step 7: Visualization (optional, for debugging the first frame)
+                # To use this, uncomment the block below and set MAX_FRAMES to a small number.
+                # The workers don't send the point arrays back, so the first frame is re-read here.
+                # if i == 0:
+                #     print("\nOpening visualization windows for the first frame...")
+                #     points_with_intensity = read_lidar_csv(path)
+                #     if VOXEL_SIZE:
+                #         points_with_intensity, point_counts = voxel_downsample(points_with_intensity, voxel_size=VOXEL_SIZE)
+                #     else:
+                #         point_counts = np.ones(points_with_intensity.shape[0], dtype=np.int64)
+                #     non_ground_points, ground_mask = filter_ground_ransac(
+                #         points_with_intensity, distance_threshold=RANSAC_DISTANCE_THRESHOLD, backend=RANSAC_BACKEND
+                #     )
+                #     labels, n_clusters = cluster_objects(
+                #         non_ground_points, eps=DBSCAN_EPS, min_samples=DBSCAN_MIN_SAMPLES,
+                #         sample_weight=point_counts[~ground_mask]
+                #     )
+                #     # 1. Show ground vs. non-ground points
+                #     visualize_points(points_with_intensity, non_ground_points, ground_mask)
+                #     # 2. Show colored clusters
+                #     if n_clusters > 0:
+                #         visualize_clusters(non_ground_points, labels)
+                #         # 3. Show tracked objects with bounding boxes
+                #         visualize_tracked_objects(non_ground_points, features, object_ids)
+
+                # Step 8: Save the results
+                # They go into the Parquet file, and optionally into a JSON file per frame.
+                # The features are only converted to Python values here, one column at a time.
+                # Noise clusters are not saved.
+                objects = features[is_object]
+                output_data = [
+                    {
+                        "object_id": object_id,
+                        "cluster_id": label,
+                        "class": cls,
+                        "num_points": num_points,
+                        "dimensions_m": {
+                            "width": width,
+                            "length": length,
+                            "height": height
+                        },
+                        "avg_intensity": avg_intensity
+                    }
+                    for object_id, label, cls, num_points, width, length, height, avg_intensity in zip(
+                        object_ids[is_object].tolist(),
+                        objects["label"].tolist(),
+                        classes[is_object].tolist(),
+                        objects["num_points"].tolist(),
+                        # Cast to float64 before rounding so the values are written as e.g. 1.23
+                        np.round(objects["width"].astype(np.float64), 2).tolist(),
+                        np.round(objects["length"].astype(np.float64), 2).tolist(),
+                        np.round(objects["height"].astype(np.float64), 2).tolist(),
+                        objects["avg_intensity"].tolist()
+                    )
+                ]
+
+                # Append this frame's detections to the Parquet file
+                if detection_writer is not None:
+                    write_detections(detection_writer, [
+                        {
+                            "frame_id": i + 1,
+                            "object_id": det["object_id"],
+                            "cluster_id": det["cluster_id"],
+                            "class": det["class"],
+                            "num_points": det["num_points"],
+                            **det["dimensions_m"],
+                            "avg_intensity": det["avg_intensity"]
+                        }
+                        for det in output_data
+                    ])
+
+                n_saved_frames += 1
+
+                if save_frame_json:
+                    output_filename = f"output/frame_{i+1:03d}_analysis.json"
+                    write_json(output_filename, output_data)
+                    print(f"Analysis results saved to: {output_filename}")
+
+    finally:
+        # Close the Parquet file so its footer is written, even if processing stopped early
+        if detection_writer is not None:
+            close_detection_writer(detection_writer, n_saved_frames)
+            print(f"\nAll detections saved to: {FRAMES_PARQUET}")
+
+    print("\nProcessing complete.")
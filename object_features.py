@@ -1,6 +1,18 @@
 import numpy as np
 
-def extract_features(points, labels):
+# The features of all clusters in a frame are stored in one structured array with these fields.
+FEATURE_DTYPE = np.dtype([
+    ("label", np.int32),
+    ("num_points", np.int32),
+    ("width", np.float32),
+    ("length", np.float32),
+    ("height", np.float32),
+    ("avg_intensity", np.int32),
+    ("bbox_min", np.float32, (3,)),
+    ("bbox_max", np.float32, (3,)),
+])
+
+def extract_features(points, labels, point_counts=None):
     """
     Extracts key features for each object cluster, such as its dimensions,
     point count, and average intensity.
@@ -8,85 +20,103 @@ def extract_features(points, labels):
     Args:
         points (np.ndarray): The non-ground points (N x 4 array: X, Y, Z, Intensity).
         labels (np.ndarray): The cluster labels from DBSCAN for each point.
+        point_counts (np.ndarray, optional): How many original points each point represents,
+                                             e.g. after voxel downsampling. Defaults to 1 per point.
 
     Returns:
-        List[dict]: A list of dictionaries, where each dictionary contains the
-                    features of a single object cluster.
+        np.ndarray: A structured array with dtype FEATURE_DTYPE, where each element
+                    contains the features of a single object cluster.
     """
-    features = []
-    unique_labels = np.unique(labels)
-    
-    for label in unique_labels:
-        # Skip noise points, which are labeled as -1
-        if label == -1:
-            continue
+    # Skip noise points, which are labeled as -1
+    valid = labels != -1
+    if not np.any(valid):
+        return np.empty(0, dtype=FEATURE_DTYPE)
 
-        # Get all points belonging to the current cluster
-        cluster_points = points[labels == label]
+    # Sort the points by label once so that every cluster becomes a contiguous segment.
+    # This lets us compute all per-cluster statistics in a single pass with reduceat.
+    order = np.argsort(labels[valid], kind='stable')
+    sorted_labels = labels[valid][order]
+    sorted_points = points[valid][order]
 
-        # --- NEW FEATURE: Average Intensity ---
-        # Calculate the average reflection intensity of the points in the cluster (from the 4th column)
-        avg_intensity = int(np.mean(cluster_points[:, 3]))
+    # The start index of each cluster's segment.
+    starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
 
-        # Calculate the spatial dimensions of the cluster using only XYZ coordinates
-        min_bound = np.min(cluster_points[:, :3], axis=0)
-        max_bound = np.max(cluster_points[:, :3], axis=0)
-        extent = max_bound - min_bound  # This gives [width, length, height]
+    # --- NEW FEATURE: Average Intensity ---
+    # Calculate the average reflection intensity of the points in each cluster (from the 4th column)
+    # The sums are accumulated in float64 to avoid losing precision on large clusters.
+    if point_counts is None:
+        counts = np.diff(np.r_[starts, len(sorted_labels)])
+        intensity_sums = np.add.reduceat(sorted_points[:, 3], starts, dtype=np.float64)
+    else:
+        # Each point stands for several original points and carries their mean intensity,
+        # so weighting by the counts gives the sums over the original points.
+        sorted_weights = point_counts[valid][order]
+        counts = np.add.reduceat(sorted_weights, starts)
+        intensity_sums = np.add.reduceat(sorted_points[:, 3] * sorted_weights, starts, dtype=np.float64)
+    avg_intensities = intensity_sums / counts
+
+    # Calculate the spatial dimensions of each cluster using only XYZ coordinates
+    min_bounds = np.minimum.reduceat(sorted_points[:, :3], starts, axis=0)
+    max_bounds = np.maximum.reduceat(sorted_points[:, :3], starts, axis=0)
+    extents = max_bounds - min_bounds  # This gives [width, length, height]
+
+    features = np.empty(len(starts), dtype=FEATURE_DTYPE)
+    features["label"] = sorted_labels[starts]
+    features["num_points"] = counts
+    features["width"] = np.round(extents[:, 0], 2)
+    features["length"] = np.round(extents[:, 1], 2)
+    features["height"] = np.round(extents[:, 2], 2)
+    features["avg_intensity"] = avg_intensities  # Truncated to an integer, like int()
+    features["bbox_min"] = np.round(min_bounds, 2)
+    features["bbox_max"] = np.round(max_bounds, 2)
 
-        feature = {
-            "label": int(label),
-            "num_points": int(len(cluster_points)),
-            "width": round(float(extent[0]), 2),
-            "length": round(float(extent[1]), 2),
-            "height": round(float(extent[2]), 2),
-            "avg_intensity": avg_intensity,
-            "bbox_min": [round(float(x), 2) for x in min_bound],
-            "bbox_max": [round(float(x), 2) for x in max_bound]
-        }
-        features.append(feature)
-        
     return features
 
 
-def classify_object_advanced(feature: dict) -> str:
+def classify_objects_advanced(features):
     """
-    Classifies objects based on their features using a set of flexible, heuristic rules.
+    Classifies all objects of a frame at once based on their features, using a set of
+    flexible, heuristic rules. The rules are evaluated as array comparisons over all
+    clusters instead of one Python call per cluster.
     
     Args:
-        feature (dict): A dictionary of features created by the extract_features function.
+        features (np.ndarray): The structured feature array created by the extract_features function.
         
     Returns:
-        str: The class label for the object ("car", "pedestrian", "cyclist", "noise", or "unknown").
+        np.ndarray: The class label of every object ("car", "pedestrian", "cyclist", "noise", or "unknown"),
+                    in the same order as the features.
     """
-    n_points = feature["num_points"]
+    n_points = features["num_points"]
     
     # To make the classification independent of the object's orientation,
     # we define 'width' as the smaller dimension and 'length' as the larger one.
-    dims = sorted([feature["width"], feature["length"]])
-    width, length = dims[0], dims[1]
-    height = feature["height"]
+    width = np.minimum(features["width"], features["length"])
+    length = np.maximum(features["width"], features["length"])
+    height = features["height"]
     
     # --- RULE 1: Noise Filter ---
     # Clusters with very few points or that are extremely small are likely noise.
-    if n_points < 20 or (length < 0.2 and width < 0.2 and height < 0.2):
-        return "noise"
+    is_noise = (n_points < 20) | ((length < 0.2) & (width < 0.2) & (height < 0.2))
 
     # --- RULE 2: Pedestrian or Cyclist ---
     # These objects are typically 'vertical' and 'narrow'.
     # Their height is significantly greater than their width and length.
-    if height > 1.0 and length < 1.5 and width < 1.5:
-        # A simple check to distinguish between pedestrians and cyclists
-        if length > 1.0:  # Cyclists are generally longer than pedestrians
-            return "cyclist"
-        else:
-            return "pedestrian"
+    is_upright = (height > 1.0) & (length < 1.5) & (width < 1.5)
+    # A simple check to distinguish between pedestrians and cyclists
+    # Cyclists are generally longer than pedestrians
+    is_cyclist = is_upright & (length > 1.0)
+    is_pedestrian = is_upright & ~(length > 1.0)
 
     # --- RULE 3: Car ---
     # Cars are typically 'horizontal' and 'large'.
     # They are larger than a certain size but not excessively tall.
-    if length > 1.5 and width > 1.0 and height > 0.8 and height < 3.0:
-        return "car"
+    is_car = (length > 1.5) & (width > 1.0) & (height > 0.8) & (height < 3.0)
     
     # --- RULE 4: Everything Else ---
     # Any cluster that doesn't fit the rules above is labeled as 'unknown'.
-    return "unknown"
\ No newline at end of file
+    # np.select applies the rules in order, so the first matching rule wins.
+    return np.select(
+        [is_noise, is_cyclist, is_pedestrian, is_car],
+        ["noise", "cyclist", "pedestrian", "car"],
+        default="unknown"
+    )
@@ -1,4 +1,9 @@
-import math
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# The cost given to track/detection pairs that are too far apart to be matched.
+# It only needs to be larger than any real distance so the solver avoids these pairs.
+_NO_MATCH_COST = 1e9
 
 class EuclideanDistTracker:
     """
@@ -6,15 +11,18 @@ class EuclideanDistTracker:
     between frames.
     """
     def __init__(self):
-        # Stores the center points of the objects we are currently tracking.
-        # Format: {object_id: (center_x, center_y)}
-        self.center_points = {}
+        # Stores the center points of the objects we are currently tracking, as a (T x 2) array
+        # of (center_x, center_y), and their IDs in the same order.
+        self.center_points = np.empty((0, 2))
+        self.object_ids = np.empty(0, dtype=np.int64)
         # A counter to assign a new, unique ID to each new object.
         self.id_count = 0
 
     def update(self, objects_rects, dist_thresh=5.0):
         """
         Updates the tracker with new object detections from the current frame.
+        Existing objects are matched to the new detections by solving an optimal assignment
+        on the full (tracked x detected) distance matrix.
 
         Args:
             objects_rects (list): A list of bounding boxes for the newly detected objects.
@@ -25,62 +33,41 @@ class EuclideanDistTracker:
         Returns:
             list: A list of the tracked objects, with their assigned IDs.
                   Each object is represented as [x, y, w, h, object_id].
+                  The list is in the same order as objects_rects, so the i-th entry
+                  is always the i-th detection.
         """
-        tracked_objects = []
-        
-        # Keep track of which new detections have not been matched yet.
-        unmatched_detections = list(range(len(objects_rects)))
-        
+        rects = np.asarray(objects_rects, dtype=float).reshape(-1, 4)
+        # The center point of every detection, as a (D x 2) array.
+        det_centers = rects[:, :2] + rects[:, 2:] / 2
+
+        matched_tracks = np.empty(0, dtype=np.int64)
+        matched_dets = np.empty(0, dtype=np.int64)
+
         # If we are already tracking objects, try to match them with the new detections.
-        if self.center_points:
-            # For each object we are tracking...
-            for obj_id, pt in self.center_points.items():
-                best_match_idx = -1
-                min_dist = dist_thresh
-                
-                # ...find the closest new detection.
-                for i in unmatched_detections:
-                    rect = objects_rects[i]
-                    x, y, w, h = rect
-                    cx = x + w / 2
-                    cy = y + h / 2
-                    dist = math.hypot(cx - pt[0], cy - pt[1])
+        if len(self.object_ids) > 0 and len(rects) > 0:
+            dist = np.linalg.norm(self.center_points[:, None, :] - det_centers[None, :, :], axis=2)
+            cost = np.where(dist < dist_thresh, dist, _NO_MATCH_COST)
+            matched_tracks, matched_dets = linear_sum_assignment(cost)
+
+            # Drop any pairs the solver was forced to make between far-apart objects.
+            close_enough = dist[matched_tracks, matched_dets] < dist_thresh
+            matched_tracks = matched_tracks[close_enough]
+            matched_dets = matched_dets[close_enough]
+
+        # Any detections left unmatched are considered new objects and get a new ID.
+        new_dets = np.setdiff1d(np.arange(len(rects)), matched_dets)
+        new_ids = self.id_count + 1 + np.arange(len(new_dets))
+        self.id_count += len(new_dets)
 
-                    # If this detection is closer than our current best match, update it.
-                    if dist < min_dist:
-                        min_dist = dist
-                        best_match_idx = i
-                
-                # If we found a good match...
-                if best_match_idx != -1:
-                    # ...get the matched detection's info...
-                    rect = objects_rects[best_match_idx]
-                    x, y, w, h = rect
-                    cx = x + w / 2
-                    cy = y + h / 2
-                    
-                    # ...update the tracked object's center point...
-                    self.center_points[obj_id] = (cx, cy)
-                    # ...add it to our list of tracked objects for this frame...
-                    tracked_objects.append([x, y, w, h, obj_id])
-                    # ...and remove it from the list of unmatched detections.
-                    unmatched_detections.remove(best_match_idx)
+        det_indices = np.concatenate([matched_dets, new_dets])
+        obj_ids = np.concatenate([self.object_ids[matched_tracks], new_ids])
 
-        # Any detections left in the unmatched list are considered new objects.
-        for i in unmatched_detections:
-            rect = objects_rects[i]
-            x, y, w, h = rect
-            cx = x + w / 2
-            cy = y + h / 2
-            
-            # Assign a new ID to this new object.
-            self.id_count += 1
-            self.center_points[self.id_count] = (cx, cy)
-            tracked_objects.append([x, y, w, h, self.id_count])
+        # Only keep the objects seen in this frame. Objects that disappeared are forgotten.
+        self.center_points = det_centers[det_indices]
+        self.object_ids = obj_ids
 
-        # Clean up the center_points dictionary by removing any IDs that are no longer
-        # being tracked (i.e., they disappeared from the frame).
-        active_ids = {obj[4] for obj in tracked_objects}
-        self.center_points = {obj_id: center for obj_id, center in self.center_points.items() if obj_id in active_ids}
+        # Put the IDs back into the order of the input detections.
+        ids_by_detection = np.empty(len(rects), dtype=np.int64)
+        ids_by_detection[det_indices] = obj_ids
 
-        return tracked_objects
\ No newline at end of file
+        return [list(rect) + [int(obj_id)] for rect, obj_id in zip(objects_rects, ids_by_detection)]
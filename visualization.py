@@ -2,7 +2,7 @@ import open3d as o3d
 import numpy as np
 import matplotlib.pyplot as plt
 
-def visualize_points(original_pts_with_intensity, non_ground_pts_with_intensity):
+def visualize_points(original_pts_with_intensity, non_ground_pts_with_intensity, ground_mask):
     """
     Visualizes the point cloud in 3D, showing the ground and non-ground points
     in different colors.
@@ -10,17 +10,17 @@ def visualize_points(original_pts_with_intensity, non_ground_pts_with_intensity)
     Args:
         original_pts_with_intensity (np.ndarray): The complete point cloud (N x 4).
         non_ground_pts_with_intensity (np.ndarray): The points classified as non-ground (M x 4).
+        ground_mask (np.ndarray): A boolean mask over the original cloud that is True for the
+                                  ground points, as returned by filter_ground_ransac.
     """
     print(f"Visualizing points: {original_pts_with_intensity.shape[0]} original, {non_ground_pts_with_intensity.shape[0]} non-ground.")
     
     # We only need the XYZ coordinates for visualization.
-    original_xyz = original_pts_with_intensity[:, :3]
-    non_ground_xyz = non_ground_pts_with_intensity[:, :3]
+    # Open3D requires float64, so we convert them here.
+    original_xyz = original_pts_with_intensity[:, :3].astype(np.float64)
+    non_ground_xyz = non_ground_pts_with_intensity[:, :3].astype(np.float64)
 
-    # A fast way to find the ground points is to see which of the original points
-    # are NOT in the non_ground set.
-    non_ground_set = {tuple(row) for row in np.round(non_ground_xyz, 5)}
-    ground_mask = [tuple(row) not in non_ground_set for row in np.round(original_xyz, 5)]
+    # The ground points are simply the RANSAC inliers, so we can select them with the mask.
     ground_xyz = original_xyz[ground_mask]
 
     # Create separate PointCloud objects for ground and non-ground points.
@@ -44,21 +44,16 @@ def visualize_clusters(points_with_intensity, labels):
         points_with_intensity (np.ndarray): The non-ground points (N x 4).
         labels (np.ndarray): The cluster label for each point.
     """
-    points_xyz = points_with_intensity[:, :3]
+    # Open3D requires float64, so we convert the coordinates here.
+    points_xyz = points_with_intensity[:, :3].astype(np.float64)
     
-    unique_labels = np.unique(labels)
     # Use a colormap to assign a unique color to each cluster ID.
+    # Looking up every point's color in a small palette colors all clusters in a single pass.
     cmap = plt.get_cmap("tab20")
-    colors = np.zeros_like(points_xyz)
-
-    for lbl in unique_labels:
-        if lbl == -1:
-            # Noise points are colored gray.
-            colors[labels == lbl] = [0.5, 0.5, 0.5]
-        else:
-            # Assign a color from the colormap based on the cluster label.
-            rgb = cmap(lbl % 20)[:3]
-            colors[labels == lbl] = rgb
+    palette = cmap(np.arange(20))[:, :3]
+    colors = palette[labels % 20]
+    # Noise points are colored gray.
+    colors[labels == -1] = [0.5, 0.5, 0.5]
 
     pcd = o3d.geometry.PointCloud()
     pcd.points = o3d.utility.Vector3dVector(points_xyz)
@@ -66,29 +61,29 @@ def visualize_clusters(points_with_intensity, labels):
 
     o3d.visualization.draw_geometries([pcd])
 
-def visualize_tracked_objects(points_with_intensity, features):
+def visualize_tracked_objects(points_with_intensity, features, object_ids):
     """
     Draws bounding boxes and their tracking IDs over the detected objects.
 
     Args:
         points_with_intensity (np.ndarray): The non-ground points (N x 4).
-        features (list): A list of dictionaries, each containing the features and
-                         the 'object_id' for a detected object.
+        features (np.ndarray): The structured feature array created by extract_features.
+        object_ids (np.ndarray): The tracking ID of each feature, or -1 if it has none
+                                 (e.g., noise clusters).
     """
     pcd = o3d.geometry.PointCloud()
-    pcd.points = o3d.utility.Vector3dVector(points_with_intensity[:, :3])
+    pcd.points = o3d.utility.Vector3dVector(points_with_intensity[:, :3].astype(np.float64))
     # Start by coloring all points gray as a background.
     pcd.paint_uniform_color([0.5, 0.5, 0.5])
 
     geometries = [pcd]
     cmap = plt.get_cmap("tab20")
 
-    for feat in features:
-        obj_id = feat.get("object_id", -1)
-        # Only draw boxes for objects that have been assigned an ID and are not noise.
-        if obj_id != -1 and feat.get("class") != "noise":
-            min_bound = feat["bbox_min"]
-            max_bound = feat["bbox_max"]
+    for feat, obj_id in zip(features, object_ids):
+        # Only draw boxes for objects that have been assigned an ID. Noise is never tracked.
+        if obj_id != -1:
+            min_bound = feat["bbox_min"].astype(np.float64)
+            max_bound = feat["bbox_max"].astype(np.float64)
             
             # Create an axis-aligned bounding box for Open3D.
             bbox = o3d.geometry.AxisAlignedBoundingBox(min_bound=min_bound, max_bound=max_bound)
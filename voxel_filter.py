@@ -0,0 +1,50 @@
+import numpy as np
+
+"""
+voxel_filter.py
+
+This file contains the function used to downsample the point cloud on a voxel grid
+before ground filtering and clustering.
+"""
+
+def voxel_downsample(points, voxel_size=0.05):
+    """
+    Reduces the point cloud by keeping a single point per voxel of a regular 3D grid.
+    Each kept point has the coordinates of the first point in its voxel, and the mean of the
+    other features (e.g., intensity) of all the points in that voxel.
+    This preserves the shape of planes and objects while making every later step
+    (RANSAC, DBSCAN, feature extraction) work on far fewer points.
+
+    Args:
+        points (np.ndarray): The input point cloud as an array (N x features, e.g., X,Y,Z,Intensity).
+        voxel_size (float): The edge length of each voxel, in meters.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: A tuple containing:
+            - downsampled_points (np.ndarray): One point per occupied voxel (M x features).
+            - point_counts (np.ndarray): How many original points fell into each voxel (M,).
+                                         This lets later steps keep reporting original point counts.
+    """
+    if points.shape[0] == 0:
+        return points, np.empty(0, dtype=np.int64)
+
+    # The integer grid coordinates of the voxel each point falls into.
+    keys = np.floor(points[:, :3] / voxel_size).astype(np.int64)
+
+    # Combine the three grid coordinates into a single integer key, so we can use a fast 1D unique.
+    keys -= keys.min(axis=0)
+    dims = keys.max(axis=0) + 1
+    voxel_ids = (keys[:, 0] * dims[1] + keys[:, 1]) * dims[2] + keys[:, 2]
+
+    # Keep the first point of each voxel and count how many points it represents.
+    _, first_indices, inverse, point_counts = np.unique(
+        voxel_ids, return_index=True, return_inverse=True, return_counts=True
+    )
+    downsampled_points = points[first_indices]
+
+    # Replace the features after XYZ with their mean over the voxel, so the kept point
+    # represents all of the voxel's points and not just the first one.
+    for col in range(3, points.shape[1]):
+        downsampled_points[:, col] = np.bincount(inverse, weights=points[:, col]) / point_counts
+
+    return downsampled_points, point_counts